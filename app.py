@@ -1,21 +1,28 @@
-import base64
+import asyncio
+import itertools
 import os
+from secrets import token_hex
 from typing import Dict, Any, Optional
 
 import uvicorn
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from llm_node import process_image_base64
+from dependencies import UPLOAD_LIMITS, validate_image, validated_image
+from llm_node import image_digest, process_image_base64
 from main import process_image_with_graph, process_content_moderation, process_image_moderation
+from result_store import ShardedResultStore
 from response_models import (
     UnifiedResponse, TaskResponse, TaskResultResponse, HealthResponse,
     APIInfoResponse, AllTasksResponse, ProcessingStatus, ProcessingMethod,
-    success_response, create_task_response,
-    create_task_result_response, create_image_processing_response, success_response_with_data, ImageProcessingResult
+    success_response, create_image_processing_response, success_response_with_data, ImageProcessingResult
 )
 
+load_dotenv()
+
 # 定义内容审查请求模型
 class ContentModerationRequest(BaseModel):
     text_content: Optional[str] = ""
@@ -23,6 +30,20 @@ class ContentModerationRequest(BaseModel):
 
 app = FastAPI(title="内容审查API", description="综合文本和图片内容审查服务")
 
+# multipart表单边界、字段头及文本字段的额外开销
+MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """根据Content-Length在读取请求体之前拒绝超限上传"""
+    limit = UPLOAD_LIMITS.get(request.url.path)
+    if limit is not None:
+        max_size, too_large_detail = limit
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+            return JSONResponse(status_code=413, content={"detail": too_large_detail})
+    return await call_next(request)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -32,123 +53,92 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 存储处理结果的字典（临时存储，实际应用中应使用数据库）
-processing_results = {}
-
-# 支持的图片格式
-SUPPORTED_IMAGE_TYPES = {
-    "image/jpeg",
-    "image/jpg",
-    "image/png",
-    "image/gif",
-    "image/bmp",
-    "image/webp"
-}
-
-def get_image_base64(file_content: bytes, file_format: str) -> str:
-    """将图片内容转换为base64格式"""
-    # 根据文件类型确定MIME类型
-    mime_type = {
-        "jpg": "jpeg",
-        "jpeg": "jpeg",
-        "png": "png",
-        "gif": "gif",
-        "bmp": "bmp",
-        "webp": "webp"
-    }.get(file_format.lower(), "jpeg")
-
-    base64_str = base64.b64encode(file_content).decode('utf-8')
-    return base64_str
+# 存储处理结果的有界LRU（临时存储，实际应用中应使用数据库）
+processing_results = ShardedResultStore(capacity=1024, shards=16)
+
+# 任务ID序号，单调递增，不受结果删除或淘汰影响
+_task_counter = itertools.count(1)
+
+# 同时运行的后台LLM任务上限，突发上传时其余任务排队等待
+LLM_CONCURRENCY = asyncio.Semaphore(int(os.getenv("LLM_CONCURRENCY", "8")))
+
+# 进程生命周期内不变的API信息和健康检查数据，只构建一次
+API_INFO = APIInfoResponse(
+    message="图片处理API",
+    version="1.0.0",
+    endpoints={
+        "upload": "/upload-image",
+        "status": "/status/{task_id}",
+        "health": "/health",
+        "sync_process": "/process-image-sync",
+        "results": "/results",
+        "content_moderation": "/moderate-content",
+        "text_moderation": "/moderate-text",
+        "image_moderation": "/moderate-image"
+    }
+)
+HEALTH = HealthResponse(
+    status="healthy",
+    version="1.0.0"
+)
 
 @app.get("/", response_model=UnifiedResponse[APIInfoResponse])
 async def root():
     """根路径，返回API信息"""
-    api_info = APIInfoResponse(
-        message="图片处理API",
-        version="1.0.0",
-        endpoints={
-            "upload": "/upload-image",
-            "status": "/status/{task_id}",
-            "health": "/health",
-            "sync_process": "/process-image-sync",
-            "results": "/results",
-            "content_moderation": "/moderate-content",
-            "text_moderation": "/moderate-text",
-            "image_moderation": "/moderate-image"
-        }
-    )
-    return success_response_with_data("API信息", data=api_info.model_dump())
+    return success_response_with_data("API信息", data=API_INFO)
 
 @app.get("/health", response_model=UnifiedResponse[HealthResponse])
 async def health_check():
     """健康检查接口"""
-    health = HealthResponse(
-        status="healthy",
-        version="1.0.0"
-    )
-    return success_response_with_data("服务健康", data=health.model_dump())
+    return success_response_with_data("服务健康", data=HEALTH)
 
 @app.post("/upload-image", response_model=UnifiedResponse[TaskResponse])
 async def upload_image(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    image: tuple[bytearray, str] = Depends(validated_image("/upload-image"))
 ) -> UnifiedResponse[TaskResponse]:
     """
     上传图片并异步处理
 
     Args:
-        file: 上传的图片文件
+        image: 校验通过的上传图片（原始内容, base64编码），10MB限制
 
     Returns:
         包含任务ID的响应
     """
     try:
-        # 验证文件类型
-        if file.content_type not in SUPPORTED_IMAGE_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的图片格式。支持的格式: {', '.join(SUPPORTED_IMAGE_TYPES)}"
-            )
-
-        # 验证文件大小（10MB限制）
-        file_size = 0
-        content = await file.read()
-        file_size = len(content)
-
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(
-                status_code=400,
-                detail="文件大小不能超过10MB"
-            )
-
-        # 获取文件格式
-        file_format = file.filename.split('.')[-1] if file.filename else "jpg"
+        raw, image_base64 = image
+        image_hash = image_digest(raw)
 
         # 生成任务ID
-        task_id = f"task_{len(processing_results) + 1}_{os.urandom(4).hex()}"
+        task_id = f"task_{next(_task_counter)}_{token_hex(4)}"
 
         # 初始化任务状态
-        processing_results[task_id] = {
-            "status": ProcessingStatus.PROCESSING,
-            "message": "图片正在处理中...",
-            "result": None,
-            "error": None
-        }
+        processing_results.put(task_id, TaskResultResponse(
+            task_id=task_id,
+            status=ProcessingStatus.PROCESSING,
+            message="图片正在处理中..."
+        ))
 
         # 添加后台任务
         background_tasks.add_task(
             process_image_background,
             task_id=task_id,
-            image_content=content,
-            file_format=file_format
+            image_base64=image_base64,
+            image_hash=image_hash
         )
 
-        task_response = create_task_response(
+        task_response = TaskResponse(
             task_id=task_id,
             status=ProcessingStatus.PROCESSING,
             message="图片上传成功，正在处理中..."
         )
-        return success_response_with_data("图片上传成功", data=task_response.model_dump())
+        return success_response_with_data(
+            "图片上传成功",
+            data=task_response,
+            task_id=task_id,
+            task_status=ProcessingStatus.PROCESSING
+        )
 
     except HTTPException:
         raise
@@ -158,47 +148,45 @@ async def upload_image(
             detail=f"处理上传文件时发生错误: {str(e)}"
         )
 
-async def process_image_background(task_id: str, image_content: bytes, file_format: str):
+async def process_image_background(task_id: str, image_base64: str, image_hash: Optional[str] = None):
     """
-    后台任务：使用graph处理图片
+    后台任务：使用graph处理图片，通过LLM_CONCURRENCY限制并发数量
     """
-    try:
-        # 将图片转换为base64
-        image_base64 = get_image_base64(image_content, file_format)
-
-        # 使用graph处理图片（推荐方式）
-        graph_result = process_image_with_graph(image_base64)
-
-        if graph_result["success"]:
-            # 更新任务状态 - 成功
-            processing_results[task_id] = create_task_result_response(
+    async with LLM_CONCURRENCY:
+        try:
+            # 使用graph处理图片（推荐方式）
+            graph_result = await process_image_with_graph(image_base64, image_hash=image_hash)
+
+            if graph_result["success"]:
+                # 更新任务状态 - 成功
+                processing_results.put(task_id, TaskResultResponse(
+                    task_id=task_id,
+                    status=ProcessingStatus.COMPLETED,
+                    message="图片处理完成（通过graph）",
+                    result=graph_result["data"],
+                    processing_method=ProcessingMethod.GRAPH
+                ))
+            else:
+                # graph处理失败，回退到直接调用
+                fallback_result = await process_image_base64(image_base64, image_hash=image_hash)
+                processing_results.put(task_id, TaskResultResponse(
+                    task_id=task_id,
+                    status=ProcessingStatus.COMPLETED,
+                    message="图片处理完成（回退处理）",
+                    result=fallback_result,
+                    processing_method=ProcessingMethod.FALLBACK,
+                    graph_error=graph_result["error"]
+                ))
+
+        except Exception as e:
+            # 更新任务状态为失败
+            processing_results.put(task_id, TaskResultResponse(
                 task_id=task_id,
-                status=ProcessingStatus.COMPLETED,
-                message="图片处理完成（通过graph）",
-                result=graph_result["data"],
-                processing_method=ProcessingMethod.GRAPH
-            ).model_dump()
-        else:
-            # graph处理失败，回退到直接调用
-            fallback_result = process_image_base64(image_base64)
-            processing_results[task_id] = create_task_result_response(
-                task_id=task_id,
-                status=ProcessingStatus.COMPLETED,
-                message="图片处理完成（回退处理）",
-                result=fallback_result,
-                processing_method=ProcessingMethod.FALLBACK,
-                graph_error=graph_result["error"]
-            ).model_dump()
-
-    except Exception as e:
-        # 更新任务状态为失败
-        processing_results[task_id] = create_task_result_response(
-            task_id=task_id,
-            status=ProcessingStatus.FAILED,
-            message="图片处理失败",
-            error=str(e),
-            processing_method=ProcessingMethod.FAILED
-        ).model_dump()
+                status=ProcessingStatus.FAILED,
+                message="图片处理失败",
+                error=str(e),
+                processing_method=ProcessingMethod.FAILED
+            ))
 
 @app.get("/status/{task_id}", response_model=UnifiedResponse[TaskResultResponse])
 async def get_processing_status(task_id: str) -> UnifiedResponse[TaskResultResponse]:
@@ -211,10 +199,10 @@ async def get_processing_status(task_id: str) -> UnifiedResponse[TaskResultRespo
     Returns:
         处理状态和结果
     """
-    if task_id not in processing_results:
+    result = processing_results.get(task_id)
+    if result is None:
         raise HTTPException(status_code=404, detail="任务ID不存在")
 
-    result = processing_results[task_id]
     return success_response_with_data("查询成功", data=result)
 
 @app.get("/results", response_model=UnifiedResponse[AllTasksResponse])
@@ -225,11 +213,12 @@ async def list_all_results() -> UnifiedResponse[AllTasksResponse]:
     Returns:
         所有任务的处理结果
     """
+    results = dict(processing_results.items())
     all_tasks = AllTasksResponse(
-        total_tasks=len(processing_results),
-        results=processing_results
+        total_tasks=len(results),
+        results=results
     )
-    return success_response_with_data("查询成功", data=all_tasks.model_dump())
+    return success_response_with_data("查询成功", data=all_tasks)
 
 @app.delete("/results/{task_id}", response_model=UnifiedResponse)
 async def delete_result(task_id: str) -> UnifiedResponse:
@@ -242,47 +231,30 @@ async def delete_result(task_id: str) -> UnifiedResponse:
     Returns:
         删除结果
     """
-    if task_id not in processing_results:
+    if processing_results.pop(task_id) is None:
         raise HTTPException(status_code=404, detail="任务ID不存在")
 
-    del processing_results[task_id]
     return success_response(message=f"任务 {task_id} 的结果已删除")
 
 @app.post("/process-image-sync", response_model=UnifiedResponse[Dict[str, Any]])
-async def process_image_sync(file: UploadFile = File(...)) -> UnifiedResponse[ImageProcessingResult]:
+async def process_image_sync(
+    image: tuple[bytearray, str] = Depends(validated_image("/process-image-sync"))
+) -> UnifiedResponse[ImageProcessingResult]:
     """
     同步处理图片 - 直接使用graph处理
 
     Args:
-        file: 上传的图片文件
+        image: 校验通过的上传图片（原始内容, base64编码），5MB限制
 
     Returns:
         直接返回处理结果
     """
     try:
-        # 验证文件类型
-        if file.content_type not in SUPPORTED_IMAGE_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的图片格式。支持的格式: {', '.join(SUPPORTED_IMAGE_TYPES)}"
-            )
-
-        # 验证文件大小（5MB限制用于同步处理）
-        content = await file.read()
-        if len(content) > 5 * 1024 * 1024:  # 5MB
-            raise HTTPException(
-                status_code=400,
-                detail="同步处理文件大小不能超过5MB，请使用异步接口"
-            )
-
-        # 获取文件格式
-        file_format = file.filename.split('.')[-1] if file.filename else "jpg"
-
-        # 将图片转换为base64
-        image_base64 = get_image_base64(content, file_format)
+        raw, image_base64 = image
+        image_hash = image_digest(raw)
 
         # 使用graph处理图片
-        result = process_image_with_graph(image_base64)
+        result = await process_image_with_graph(image_base64, image_hash=image_hash)
 
         if result["success"]:
             response = create_image_processing_response(
@@ -294,7 +266,7 @@ async def process_image_sync(file: UploadFile = File(...)) -> UnifiedResponse[Im
             return response
         else:
             # graph处理失败，回退到直接调用
-            fallback_result = process_image_base64(image_base64)
+            fallback_result = await process_image_base64(image_base64, image_hash=image_hash)
             response = create_image_processing_response(
                 success=True,
                 message="图片处理成功（回退处理）",
@@ -331,7 +303,7 @@ async def moderate_text_content(request: ContentModerationRequest) -> UnifiedRes
             )
 
         # 调用内容审查函数
-        result = process_content_moderation(text_content=request.text_content)
+        result = await process_content_moderation(text_content=request.text_content)
 
         if result["success"]:
             return success_response_with_data(
@@ -379,27 +351,11 @@ async def moderate_content(
 
         # 处理图片（如果提供）
         if file:
-            # 验证文件类型
-            if file.content_type not in SUPPORTED_IMAGE_TYPES:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"不支持的图片格式。支持的格式: {', '.join(SUPPORTED_IMAGE_TYPES)}"
-                )
-
-            # 验证文件大小（5MB限制）
-            content = await file.read()
-            if len(content) > 5 * 1024 * 1024:  # 5MB
-                raise HTTPException(
-                    status_code=400,
-                    detail="图片文件大小不能超过5MB"
-                )
-
-            # 获取文件格式并转换为base64
-            file_format = file.filename.split('.')[-1] if file.filename else "jpg"
-            image_base64 = get_image_base64(content, file_format)
+            # 验证文件类型和大小（5MB限制）并转换为base64
+            _, image_base64 = await validate_image(file, *UPLOAD_LIMITS["/moderate-content"])
 
         # 调用综合内容审查函数
-        result = process_content_moderation(
+        result = await process_content_moderation(
             text_content=text_content or "",
             image_base64=image_base64
         )
@@ -424,38 +380,23 @@ async def moderate_content(
         )
 
 @app.post("/moderate-image", response_model=UnifiedResponse[Dict[str, Any]])
-async def moderate_image_content(file: UploadFile = File(...)) -> UnifiedResponse[Dict[str, Any]]:
+async def moderate_image_content(
+    image: tuple[bytearray, str] = Depends(validated_image("/moderate-image"))
+) -> UnifiedResponse[Dict[str, Any]]:
     """
     纯图片内容审查接口
 
     Args:
-        file: 上传的图片文件
+        image: 校验通过的上传图片（原始内容, base64编码），5MB限制
 
     Returns:
         图片审查结果
     """
     try:
-        # 验证文件类型
-        if file.content_type not in SUPPORTED_IMAGE_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的图片格式。支持的格式: {', '.join(SUPPORTED_IMAGE_TYPES)}"
-            )
-
-        # 验证文件大小（5MB限制）
-        content = await file.read()
-        if len(content) > 5 * 1024 * 1024:  # 5MB
-            raise HTTPException(
-                status_code=400,
-                detail="图片文件大小不能超过5MB"
-            )
-
-        # 获取文件格式并转换为base64
-        file_format = file.filename.split('.')[-1] if file.filename else "jpg"
-        image_base64 = get_image_base64(content, file_format)
+        _, image_base64 = image
 
         # 调用图片审查函数
-        result = process_image_moderation(image_base64)
+        result = await process_image_moderation(image_base64)
 
         if result["success"]:
             return success_response_with_data(
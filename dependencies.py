@@ -0,0 +1,150 @@
+import struct
+from typing import Optional
+
+import pybase64
+from fastapi import File, HTTPException, UploadFile
+
+# 各上传接口的图片大小上限及超限提示
+UPLOAD_LIMITS = {
+    "/upload-image": (10 * 1024 * 1024, "文件大小不能超过10MB"),
+    "/process-image-sync": (5 * 1024 * 1024, "同步处理文件大小不能超过5MB，请使用异步接口"),
+    "/moderate-content": (5 * 1024 * 1024, "图片文件大小不能超过5MB"),
+    "/moderate-image": (5 * 1024 * 1024, "图片文件大小不能超过5MB")
+}
+
+# 支持的图片格式（Content-Type → 图片格式）
+IMAGE_FORMAT_BY_MIME = {
+    "image/jpeg": "jpeg",
+    "image/jpg": "jpeg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/bmp": "bmp",
+    "image/webp": "webp"
+}
+SUPPORTED_IMAGE_TYPES = frozenset(IMAGE_FORMAT_BY_MIME)
+UNSUPPORTED_IMAGE_TYPE_DETAIL = f"不支持的图片格式。支持的格式: {', '.join(sorted(SUPPORTED_IMAGE_TYPES))}"
+
+# 文件头前12字节按小端序解析为 (0-7字节, 8-11字节) 两个整数，用整数比较匹配魔数
+IMAGE_HEADER_SIZE = 12
+_IMAGE_HEADER = struct.Struct("<QI")
+
+# 流式读取上传文件的块大小，48KB是3的倍数，每块可独立进行base64编码
+UPLOAD_CHUNK_SIZE = 48 * 1024
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """
+    根据文件头魔数识别图片格式
+
+    Args:
+        header: 文件开头至少12字节的内容
+
+    Returns:
+        图片格式（与IMAGE_FORMAT_BY_MIME的取值一致），无法识别时返回None
+    """
+    if len(header) < IMAGE_HEADER_SIZE:
+        return None
+
+    head, tail = _IMAGE_HEADER.unpack_from(header)
+    if head & 0xFFFFFF == 0xFFD8FF:  # FF D8 FF
+        return "jpeg"
+    if head == 0x0A1A0A0D474E5089:  # 89 'PNG' 0D 0A 1A 0A
+        return "png"
+    if head & 0xFFFFFFFF == 0x38464947:  # 'GIF8'
+        return "gif"
+    if head & 0xFFFFFFFF == 0x46464952 and tail == 0x50424557:  # 'RIFF' .... 'WEBP'
+        return "webp"
+    if head & 0xFFFF == 0x4D42:  # 'BM'
+        return "bmp"
+    return None
+
+
+async def read_and_b64(file: UploadFile, max_size: int, too_large_detail: str) -> tuple[bytearray, str]:
+    """
+    分块读取上传文件并同步进行base64编码
+
+    Args:
+        file: 上传的图片文件
+        max_size: 允许的最大字节数，超过后立即中止读取
+        too_large_detail: 超过大小限制时的错误信息
+
+    Returns:
+        (原始图片内容, base64编码字符串)
+    """
+    # 已知文件大小时直接拒绝超限文件，并一次性分配缓冲区，避免逐块扩容
+    if file.size is not None and file.size > max_size:
+        raise HTTPException(status_code=413, detail=too_large_detail)
+    content = bytearray(file.size or 0)
+    parts = []
+    size = 0
+    encoded = 0
+
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        if size + len(chunk) > max_size:
+            raise HTTPException(status_code=413, detail=too_large_detail)
+        # 在预分配范围内原地写入，超出部分自动扩容
+        content[size:size + len(chunk)] = chunk
+        size += len(chunk)
+
+        # 只编码3字节对齐的部分，剩余字节留到下一块，避免中间出现填充
+        encodable = size - size % 3
+        if encodable > encoded:
+            with memoryview(content) as view:
+                parts.append(pybase64.b64encode_as_string(view[encoded:encodable]))
+            encoded = encodable
+
+    # 实际内容少于预分配大小时截断
+    del content[size:]
+    if encoded < size:
+        with memoryview(content) as view:
+            parts.append(pybase64.b64encode_as_string(view[encoded:]))
+
+    return content, ''.join(parts)
+
+
+async def validate_image(file: UploadFile, max_size: int, too_large_detail: str) -> tuple[bytearray, str]:
+    """
+    校验上传图片的类型和大小，并转换为base64
+
+    Args:
+        file: 上传的图片文件
+        max_size: 允许的最大字节数
+        too_large_detail: 超过大小限制时的错误信息
+
+    Returns:
+        (原始图片内容, base64编码字符串)
+    """
+    if file.content_type not in SUPPORTED_IMAGE_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=UNSUPPORTED_IMAGE_TYPE_DETAIL
+        )
+
+    # 校验文件头，防止Content-Type与实际内容不符
+    header = await file.read(IMAGE_HEADER_SIZE)
+    await file.seek(0)
+    if sniff_image_format(header) != IMAGE_FORMAT_BY_MIME[file.content_type]:
+        raise HTTPException(
+            status_code=400,
+            detail="文件内容与声明的图片格式不符"
+        )
+
+    return await read_and_b64(file, max_size, too_large_detail)
+
+
+def validated_image(path: str):
+    """
+    创建按接口大小限制校验上传图片的FastAPI依赖
+
+    Args:
+        path: 接口路径，对应UPLOAD_LIMITS中的大小限制
+
+    Returns:
+        返回(原始图片内容, base64编码字符串)的依赖函数
+    """
+    max_size, too_large_detail = UPLOAD_LIMITS[path]
+
+    async def dependency(file: UploadFile = File(...)) -> tuple[bytearray, str]:
+        return await validate_image(file, max_size, too_large_detail)
+
+    return dependency
@@ -1,30 +1,11 @@
-import os
+import asyncio
 import base64
 from typing import Dict, Any
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+import orjson
+from llm_client import get_chat_llm
 
 
-def moderate_image_with_llm(image_base64: str) -> Dict[str, Any]:
-    """
-    使用LLM进行图片内容审查
-
-    Args:
-        image_base64: 图片的base64编码
-
-    Returns:
-        图片审查结果字典
-    """
-    load_dotenv()
-
-    chatLLM = ChatOpenAI(
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        base_url=os.getenv("DASHSCOPE_API_URL"),
-        model="qwen3-vl-plus",  # 使用视觉模型
-        temperature=0.1
-    )
-
-    system_prompt = """你是一个专业的图片内容审核员。请审核图片是否包含不当信息。
+_SYSTEM_PROMPT = """你是一个专业的图片内容审核员。请审核图片是否包含不当信息。
 
 审核标准包括但不限于：
 1. 暴力、血腥内容：如武器、血迹、打斗场面、虐待等
@@ -51,8 +32,19 @@ def moderate_image_with_llm(image_base64: str) -> Dict[str, Any]:
   "description": "图片显示一个人持有武器"
 }"""
 
+
+async def moderate_image_with_llm(image_base64: str) -> Dict[str, Any]:
+    """
+    使用LLM进行图片内容审查
+
+    Args:
+        image_base64: 图片的base64编码
+
+    Returns:
+        图片审查结果字典
+    """
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": _SYSTEM_PROMPT},
         {"role": "user", "content": [
             {"type": "text", "text": "请审核这张图片的内容是否安全"},
             {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{image_base64}"}}
@@ -60,18 +52,16 @@ def moderate_image_with_llm(image_base64: str) -> Dict[str, Any]:
     ]
 
     try:
-        response = chatLLM.invoke(messages)
+        response = await get_chat_llm("qwen3-vl-plus", temperature=0.1).ainvoke(messages)
         content = response.content
 
         # 尝试提取JSON内容
-        import json
-        if "```json" in content:
-            json_start = content.find("```json") + 7
-            json_end = content.find("```", json_start)
-            json_content = content[json_start:json_end].strip()
-            result = json.loads(json_content)
+        _, fence, rest = content.partition("```json")
+        if fence:
+            json_content, _, _ = rest.partition("```")
+            result = orjson.loads(json_content)
         else:
-            result = json.loads(content)
+            result = orjson.loads(content)
 
         return result
     except Exception as e:
@@ -88,7 +78,7 @@ def moderate_image_with_llm(image_base64: str) -> Dict[str, Any]:
         }
 
 
-def analyze_image_content(image_base64: str) -> Dict[str, Any]:
+async def analyze_image_content(image_base64: str) -> Dict[str, Any]:
     """
     分析图片内容（非审核用途）
 
@@ -98,15 +88,6 @@ def analyze_image_content(image_base64: str) -> Dict[str, Any]:
     Returns:
         图片分析结果
     """
-    load_dotenv()
-
-    chatLLM = ChatOpenAI(
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        base_url=os.getenv("DASHSCOPE_API_URL"),
-        model="qwen3-vl-plus",
-        temperature=0.3
-    )
-
     messages = [
         {"role": "system", "content": "你是一个专业的图片分析师，请客观描述图片中的内容。"},
         {"role": "user", "content": [
@@ -116,7 +97,7 @@ def analyze_image_content(image_base64: str) -> Dict[str, Any]:
     ]
 
     try:
-        response = chatLLM.invoke(messages)
+        response = await get_chat_llm("qwen3-vl-plus", temperature=0.3).ainvoke(messages)
         return {
             "description": response.content,
             "success": True,
@@ -130,7 +111,7 @@ def analyze_image_content(image_base64: str) -> Dict[str, Any]:
         }
 
 
-def image_moderation_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def image_moderation_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     图片审查节点函数
 
@@ -159,11 +140,11 @@ def image_moderation_node(state: Dict[str, Any]) -> Dict[str, Any]:
         }
 
     try:
-        # 进行图片内容审查
-        moderation_result = moderate_image_with_llm(image_base64)
-
-        # 同时进行图片内容分析（用于记录）
-        analysis_result = analyze_image_content(image_base64)
+        # 并发进行图片内容审查和图片内容分析（用于记录），两者互不依赖
+        moderation_result, analysis_result = await asyncio.gather(
+            moderate_image_with_llm(image_base64),
+            analyze_image_content(image_base64)
+        )
 
         return {
             "image_moderation_result": moderation_result,
@@ -188,7 +169,7 @@ if __name__ == "__main__":
         print("开始图片内容审查...")
 
         # 进行审查
-        result = image_moderation_node({"image_base64": image_base64})
+        result = asyncio.run(image_moderation_node({"image_base64": image_base64}))
 
         print("审查结果:")
         print(f"错误: {result.get('error')}")
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import ssl
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+# HTTP/2传输依赖h2（httpx[http2]），缺失时在导入阶段直接报错，而不是让每次模型请求都失败
+try:
+    import h2  # noqa: F401
+except ImportError as e:
+    raise ImportError("缺少HTTP/2依赖h2，请执行 uv sync 安装 httpx[http2]") from e
+
+# 加载环境变量
+load_dotenv()
+
+# 所有模型客户端共享的连接池大小（均请求同一个DashScope服务）
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+
+
+@lru_cache(maxsize=1)
+def _get_http_client() -> httpx.Client:
+    """创建所有模型客户端共用的同步HTTP客户端，使用HTTP/2在同一连接上复用并发请求"""
+    return httpx.Client(transport=httpx.HTTPTransport(http2=True, retries=1, limits=_HTTP_LIMITS))
+
+
+@lru_cache(maxsize=1)
+def _get_ssl_context() -> ssl.SSLContext:
+    """SSL上下文与事件循环无关，只创建一次（加载证书较慢），供每个循环的异步客户端复用"""
+    return httpx.create_ssl_context()
+
+
+# 异步连接池绑定在创建它的事件循环上，不能跨循环复用（多次asyncio.run时旧循环已关闭），
+# 因此按事件循环分别缓存：(该循环共用的异步HTTP客户端, {模型配置: 模型客户端})
+_LOOP_CLIENTS: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Dict[Tuple[Any, ...], ChatOpenAI]]] = {}
+_LOOP_CLIENTS_LOCK = Lock()
+
+
+def _get_loop_clients(
+    loop: asyncio.AbstractEventLoop
+) -> Tuple[httpx.AsyncClient, Dict[Tuple[Any, ...], ChatOpenAI]]:
+    """获取事件循环对应的异步HTTP客户端和模型客户端缓存，同时清理已关闭循环的缓存"""
+    with _LOOP_CLIENTS_LOCK:
+        clients = _LOOP_CLIENTS.get(loop)
+        if clients is None:
+            for closed_loop in [cached_loop for cached_loop in _LOOP_CLIENTS if cached_loop.is_closed()]:
+                del _LOOP_CLIENTS[closed_loop]
+            # 同一循环内的模型客户端共用一个异步客户端，使用HTTP/2在同一连接上复用并发请求
+            http_async_client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True, retries=1, limits=_HTTP_LIMITS, verify=_get_ssl_context()
+                )
+            )
+            clients = _LOOP_CLIENTS[loop] = (http_async_client, {})
+        return clients
+
+
+def _create_chat_llm(
+    model: str,
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    streaming: bool,
+    http_async_client: Optional[httpx.AsyncClient]
+) -> ChatOpenAI:
+    """创建DashScope模型客户端，同步请求统一使用共享的同步HTTP客户端"""
+    return ChatOpenAI(
+        api_key=os.getenv("DASHSCOPE_API_KEY"),
+        base_url=os.getenv("DASHSCOPE_API_URL"),
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        streaming=streaming,
+        http_client=_get_http_client(),
+        http_async_client=http_async_client
+    )
+
+
+@lru_cache(maxsize=16)
+def _get_sync_chat_llm(
+    model: str,
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    streaming: bool
+) -> ChatOpenAI:
+    """在事件循环之外获取的模型客户端只用于同步调用，整个进程共用"""
+    return _create_chat_llm(model, temperature, max_tokens, streaming, http_async_client=None)
+
+
+def get_chat_llm(
+    model: str,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    streaming: bool = False
+) -> ChatOpenAI:
+    """
+    获取DashScope模型客户端，相同配置只创建一次，首次使用时初始化
+
+    在事件循环中调用时返回绑定该循环异步连接池的客户端，异步调用应在当前循环内获取客户端，
+    不要跨asyncio.run保存使用
+
+    Args:
+        model: 模型名称，如 qwen-plus、qwen3-vl-plus
+        temperature: 采样温度，None时使用模型默认值
+        max_tokens: 输出token上限，None时不限制
+        streaming: 是否以流式方式请求
+
+    Returns:
+        复用共享连接池的ChatOpenAI客户端
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _get_sync_chat_llm(model, temperature, max_tokens, streaming)
+
+    http_async_client, llm_cache = _get_loop_clients(loop)
+    key = (model, temperature, max_tokens, streaming)
+    llm = llm_cache.get(key)
+    if llm is None:
+        llm = llm_cache[key] = _create_chat_llm(model, temperature, max_tokens, streaming, http_async_client)
+    return llm
@@ -1,43 +1,305 @@
-import os
-import base64
-from typing import Optional, Dict, Any
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+import asyncio
+import hashlib
+import io
+import logging
+import re
+from contextlib import aclosing
+import pybase64
+from typing import Optional, Dict, Any, List, Callable
+import orjson
+from cachetools import LRUCache
+from langchain_core.messages import AIMessage, BaseMessage, message_chunk_to_message
 from langgraph.graph import MessagesState
+from llm_client import get_chat_llm
+from PIL import Image
 
+logger = logging.getLogger(__name__)
 
-def load_image_as_base64(image_path):
+# 图片处理使用的视觉模型和系统提示词
+_VISION_MODEL = "qwen3-vl-plus"
+_SYSTEM_PROMPT = (
+    "你是一个专业的图片审核员。仅输出JSON，不要输出其他内容："
+    '{"safe": bool, "risk": "low|medium|high", "categories": [...], "desc": "≤30字的图片描述"}'
+)
+
+# 静态的系统消息和用户文本部分只构建一次，每次请求只需构建图片部分
+_SYS_MSG = {"role": "system", "content": _SYSTEM_PROMPT}
+_USER_TEXT_PART = {"type": "text", "text": "请审核图片中的内容"}
+
+# 单张图片审核结论的输出token上限，结论为简短JSON，限制生成长度以降低延迟
+_VERDICT_MAX_TOKENS = 128
+
+# 以(模型, 系统提示词, 图片哈希)为key缓存LLM响应，重复提交的图片不再调用模型
+_RESPONSE_CACHE = LRUCache(maxsize=512)
+
+def verdict_complete(content: str) -> bool:
+    """判断流式输出中是否已包含完整的审核结论JSON对象，可作为stop_when提前结束生成"""
+    if not content.rstrip().endswith("}"):
+        return False
+    start = content.find("{")
+    if start < 0:
+        return False
+    try:
+        orjson.loads(content[start:].rstrip())
+    except orjson.JSONDecodeError:
+        return False
+    return True
+
+
+def _dump_message(message: BaseMessage) -> str:
+    """将LLM响应消息序列化为JSON字符串"""
+    return orjson.dumps(message.model_dump(), default=str).decode()
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """计算图片原始字节的哈希值，用作响应缓存的key"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+# 发送给视觉模型的图片最长边和JPEG压缩质量
+MAX_IMAGE_SIDE = 1568
+JPEG_QUALITY = 85
+
+
+def compress_image(image_bytes: bytes, max_side: int = MAX_IMAGE_SIDE, quality: int = JPEG_QUALITY) -> bytes:
+    """
+    将图片缩放并重新编码为JPEG，已是JPEG且尺寸未超限的图片原样返回
+
+    Args:
+        image_bytes: 图片原始字节
+        max_side: 最长边像素上限
+        quality: JPEG压缩质量
+
+    Returns:
+        JPEG图片字节
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        if img.format == "JPEG" and max(img.size) <= max_side:
+            return image_bytes
+        # JPEG解码时直接按比例缩小，避免解码完整尺寸
+        img.draft("RGB", (max_side, max_side))
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
+
+def load_image_as_base64(image_path, max_side: int = MAX_IMAGE_SIDE, quality: int = JPEG_QUALITY):
     with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+        return pybase64.b64encode_as_string(compress_image(image_file.read(), max_side, quality))
 
 
-def process_image_base64(image_base64: str) -> str:
+def load_image(image_path, max_side: int = MAX_IMAGE_SIDE, quality: int = JPEG_QUALITY) -> tuple[bytes, str, str]:
+    """
+    读取并按需压缩图片，一次得到原始字节、哈希值和base64编码
 
-    # 加载环境变量
-    load_dotenv()
+    Args:
+        image_path: 图片路径
+        max_side: 最长边像素上限
+        quality: JPEG压缩质量
+
+    Returns:
+        (压缩后的图片字节, 图片哈希值, base64编码)
+    """
+    with open(image_path, "rb") as image_file:
+        raw = compress_image(image_file.read(), max_side, quality)
+    return raw, image_digest(raw), pybase64.b64encode_as_string(raw)
+
+
+# 图片data URL前缀，发送给视觉模型的图片统一按JPEG标注
+IMAGE_DATA_URL_PREFIX = "data:image/jpeg;base64,"
+
+
+def to_image_data_url(image_base64: str) -> str:
+    """将图片base64编码拼接为data URL，每张图片只需拼接一次"""
+    return IMAGE_DATA_URL_PREFIX + image_base64
+
+
+def load_image_as_data_url(image_path: str, max_side: int = MAX_IMAGE_SIDE, quality: int = JPEG_QUALITY) -> str:
+    """读取图片文件，按需压缩为JPEG后编码为data URL"""
+    return to_image_data_url(load_image_as_base64(image_path, max_side, quality))
+
+
+async def load_image_async(image_path, max_side: int = MAX_IMAGE_SIDE, quality: int = JPEG_QUALITY) -> tuple[bytes, str, str]:
+    """在线程池中读取并压缩图片，不阻塞事件循环，返回值同load_image"""
+    return await asyncio.to_thread(load_image, image_path, max_side, quality)
+
+
+async def process_image_data_url(
+    image_data_url: str,
+    image_hash: Optional[str] = None,
+    stop_when: Optional[Callable[[str], bool]] = verdict_complete
+) -> str:
+    """
+    使用视觉模型流式处理图片，相同图片命中缓存时直接返回之前的结果
+
+    Args:
+        image_data_url: 图片的data URL（data:image/jpeg;base64,...）
+        image_hash: 图片原始字节的哈希值（image_digest），未提供时由data URL解码后计算
+        stop_when: 提前结束判断，传入已生成的文本，返回True时停止生成；默认在输出完整的审核结论JSON后停止，
+            传入None时等待模型生成结束
+
+    Returns:
+        LLM响应的JSON字符串
+    """
+    if image_hash is None:
+        image_base64 = image_data_url.partition(",")[2]
+        image_hash = image_digest(pybase64.b64decode(image_base64, validate=False))
+    cache_key = (_VISION_MODEL, _SYSTEM_PROMPT, image_hash)
+    cached_response = _RESPONSE_CACHE.get(cache_key)
+    if cached_response is not None:
+        return cached_response
 
-    chatLLM = ChatOpenAI(
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        base_url=os.getenv("DASHSCOPE_API_URL"),
-        model="qwen3-vl-plus",
-        streaming=True
-        # other params...
-    )
     messages = [
-        {"role": "system", "content": "你是一个专业的图片审核员，回复你在图片中看到了什么。"},
+        _SYS_MSG,
         {"role": "user", "content": [
-            {"type": "text", "text": "请描述图片中的内容"},
-            {"type": "image_url", "image_url": {"url": f"data:image/jpg;base64,{image_base64}"}}
+            _USER_TEXT_PART,
+            {"type": "image_url", "image_url": {"url": image_data_url}}
         ]}
     ]
-    response = chatLLM.invoke(messages)
+    # 逐块累积流式输出，满足stop_when时提前关闭流，不再等待剩余生成
+    response = None
+    stopped_early = False
+    async with aclosing(get_chat_llm(_VISION_MODEL, temperature=0, max_tokens=_VERDICT_MAX_TOKENS, streaming=True).astream(messages)) as stream:
+        async for chunk in stream:
+            response = chunk if response is None else response + chunk
+            if stop_when is not None and stop_when(response.content):
+                stopped_early = True
+                break
 
-    json_response = response.model_dump_json()
-    print(json_response)
+    if response is None:
+        raise ValueError("视觉模型未返回任何内容")
+
+    json_response = _dump_message(message_chunk_to_message(response))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("LLM response: %s", json_response)
+    # 自定义条件提前结束的结果可能不完整，不写入缓存；已输出完整审核结论时结果完整，照常缓存
+    if not stopped_early or stop_when is verdict_complete:
+        _RESPONSE_CACHE[cache_key] = json_response
     return json_response
 
 
-def llm_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def process_image_base64(
+    image_base64: str,
+    image_hash: Optional[str] = None,
+    stop_when: Optional[Callable[[str], bool]] = verdict_complete
+) -> str:
+    """
+    使用视觉模型处理base64编码的图片（兼容旧调用方式）
+
+    Args:
+        image_base64: 图片的base64编码
+        image_hash: 图片原始字节的哈希值（image_digest），未提供时由base64解码后计算
+        stop_when: 可选的提前结束判断，见process_image_data_url
+
+    Returns:
+        LLM响应的JSON字符串
+    """
+    if image_hash is None:
+        image_hash = image_digest(pybase64.b64decode(image_base64, validate=False))
+    return await process_image_data_url(to_image_data_url(image_base64), image_hash=image_hash, stop_when=stop_when)
+
+
+async def process_images_async(
+    images_base64: List[str],
+    max_concurrency: int = 8,
+    image_hashes: Optional[List[Optional[str]]] = None
+) -> List[str]:
+    """
+    并发处理多张图片
+
+    Args:
+        images_base64: 图片base64编码列表
+        max_concurrency: 同时进行的LLM请求上限，避免超出DashScope的QPM限制
+        image_hashes: 与images_base64一一对应的图片哈希值，未提供时逐张解码后计算
+
+    Returns:
+        与输入顺序一致的处理结果列表
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    if image_hashes is None:
+        image_hashes = [None] * len(images_base64)
+
+    async def process_one(image_base64: str, image_hash: Optional[str]) -> str:
+        async with semaphore:
+            return await process_image_base64(image_base64, image_hash=image_hash)
+
+    return await asyncio.gather(*(
+        process_one(image_base64, image_hash)
+        for image_base64, image_hash in zip(images_base64, image_hashes)
+    ))
+
+
+# 批量请求中每张图片描述的前缀，如"[图1]"
+_BATCH_SECTION_RE = re.compile(r"\[图(\d+)\]")
+
+
+def _split_batch_sections(content: str, count: int) -> Optional[List[str]]:
+    """按"[图N]"前缀拆分批量描述，图片编号不完整时返回None"""
+    parts = _BATCH_SECTION_RE.split(content)
+    sections = {int(number): text.strip() for number, text in zip(parts[1::2], parts[2::2])}
+    if sorted(sections) != list(range(1, count + 1)):
+        return None
+    return [sections[number] for number in range(1, count + 1)]
+
+
+async def process_images_batched(images_base64: List[str], max_concurrency: int = 8) -> List[str]:
+    """
+    将多张图片放入同一个请求中处理，分摊网络往返和提示词开销
+
+    Args:
+        images_base64: 图片base64编码列表
+        max_concurrency: 回退到逐张处理时的并发上限
+
+    Returns:
+        与输入顺序一致的处理结果列表（LLM响应的JSON字符串）
+    """
+    # 命中缓存的图片直接使用之前的结果，重复的图片只请求一次，其余图片合并为一个请求
+    image_hashes = [image_digest(pybase64.b64decode(image_base64, validate=False)) for image_base64 in images_base64]
+    results = {}
+    uncached = {}
+    for image_base64, image_hash in zip(images_base64, image_hashes):
+        cached_response = _RESPONSE_CACHE.get((_VISION_MODEL, _SYSTEM_PROMPT, image_hash))
+        if cached_response is not None:
+            results[image_hash] = cached_response
+        else:
+            uncached.setdefault(image_hash, image_base64)
+
+    if len(uncached) <= 1:
+        # 单张图片无需合并请求，逐张处理时同样读写缓存
+        for image_hash, image_base64 in uncached.items():
+            results[image_hash] = await process_image_base64(image_base64, image_hash=image_hash)
+        return [results[image_hash] for image_hash in image_hashes]
+
+    content = [{"type": "text", "text": "请逐一审核以下每张图片，每张图片的JSON以'[图N]'为前缀"}]
+    content.extend(
+        {"type": "image_url", "image_url": {"url": to_image_data_url(image_base64)}}
+        for image_base64 in uncached.values()
+    )
+    messages = [
+        _SYS_MSG,
+        {"role": "user", "content": content}
+    ]
+    # 输出上限随图片数量变化，按请求传入，复用同一个客户端
+    response = await get_chat_llm(_VISION_MODEL, temperature=0, streaming=True).ainvoke(
+        messages, max_tokens=_VERDICT_MAX_TOKENS * len(uncached)
+    )
+
+    sections = _split_batch_sections(response.content, len(uncached))
+    if sections is None or not all(verdict_complete(section) for section in sections):
+        # 模型没有按编号逐一描述，或有图片的结论不完整（如输出被截断）时回退到逐张处理，
+        # 不完整的批量结果不写入缓存
+        responses = await process_images_async(list(uncached.values()), max_concurrency, list(uncached))
+    else:
+        responses = [_dump_message(AIMessage(content=section)) for section in sections]
+        # 按图片哈希逐一缓存拆分后的结果，之后单张或批量提交同一张图片都可直接命中
+        for image_hash, json_response in zip(uncached, responses):
+            _RESPONSE_CACHE[(_VISION_MODEL, _SYSTEM_PROMPT, image_hash)] = json_response
+    results.update(zip(uncached, responses))
+    return [results[image_hash] for image_hash in image_hashes]
+
+
+async def llm_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     LLM节点处理函数，从状态中获取图片数据并进行处理
 
@@ -57,9 +319,11 @@ def llm_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "result": None
         }
 
-    # 处理图片
+    # 处理图片，调用方已持有原始字节时通过image_hash传入哈希值，避免再次解码
     try:
-        result = process_image_base64(image_base64)
+        image_hash = state.get("image_hash") or image_digest(pybase64.b64decode(image_base64, validate=False))
+        # 模型输出完整的审核结论JSON后即结束流式生成，不再等待剩余输出
+        result = await process_image_base64(image_base64, image_hash=image_hash, stop_when=verdict_complete)
         return {
             "result": result,
             "error": None
@@ -72,8 +336,8 @@ def llm_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
 
 # 保持原有的向后兼容性
-def llm_node_legacy(state: MessagesState) -> str:
+async def llm_node_legacy(state: MessagesState) -> str:
     """保持向后兼容的原始函数"""
-    image_1_base64 = load_image_as_base64("./images/image1.jpg")
-    result = process_image_base64(image_1_base64)
+    _, image_1_hash, image_1_base64 = await load_image_async("./images/image1.jpg")
+    result = await process_image_base64(image_1_base64, image_hash=image_1_hash)
     return result
\ No newline at end of file
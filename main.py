@@ -1,17 +1,26 @@
-from typing import TypedDict, Dict, Any, List
+from functools import lru_cache
+from typing import TypedDict, Dict, Any, List, Literal, Annotated, Optional
 from langgraph.graph import StateGraph, MessagesState, END, START
 from llm_node import llm_node, llm_node_legacy
 from text_moderation_node import text_moderation_node
 from image_moderation_node import image_moderation_node
 
+# 风险级别排序，用于取多个审查结果中的最高风险
+_RISK_RANK = {"low": 0, "medium": 1, "high": 2}
+
 # 定义自定义状态类型，用于图片处理
 class ImageProcessingState(TypedDict):
     """图片处理状态定义"""
     image_base64: str  # 图片的base64编码
+    image_hash: str    # 图片原始字节的哈希值（可选，用于响应缓存）
     messages: list     # 消息列表
     result: str        # 处理结果（字符串格式）
     error: str         # 错误信息
 
+def _last_value(current: Optional[str], update: Optional[str]) -> Optional[str]:
+    """并行分支同时写入同一字段时取最后写入的值"""
+    return update
+
 # 定义综合内容审查状态类型
 class ContentModerationState(TypedDict):
     """综合内容审查状态定义"""
@@ -23,7 +32,7 @@ class ContentModerationState(TypedDict):
     overall_safe: bool             # 综合安全性判断
     risk_level: str                # 风险级别
     recommendations: List[str]     # 建议列表
-    error: str                     # 错误信息
+    error: Annotated[Optional[str], _last_value]  # 错误信息（文本和图片审查并行写入）
 
 def should_process_image(state: ContentModerationState) -> bool:
     """判断是否需要处理图片"""
@@ -33,8 +42,14 @@ def should_process_text(state: ContentModerationState) -> bool:
     """判断是否需要处理文本"""
     return bool(state.get("text_content"))
 
-def combine_moderation_results(state: ContentModerationState) -> ContentModerationState:
-    """综合文本和图片审查结果"""
+def route_moderators(state: ContentModerationState) -> List[str]:
+    """选择需要并行执行的审查节点，有图片时文本和图片审查同时进行"""
+    if should_process_image(state):
+        return ["text_moderator", "image_moderator"]
+    return ["text_moderator"]
+
+def combine_moderation_results(state: ContentModerationState) -> Dict[str, Any]:
+    """综合文本和图片审查结果，只返回需要更新的字段，由graph合并到状态中"""
     text_result = state.get("text_moderation_result", {})
     image_moderation_result = state.get("image_moderation_result", {})
     image_analysis_result = state.get("image_analysis_result", "")
@@ -52,7 +67,7 @@ def combine_moderation_results(state: ContentModerationState) -> ContentModerati
 
         if not text_safe:
             overall_safe = False
-            risk_level = max(risk_level, text_risk, key=lambda x: ["low", "medium", "high"].index(x))
+            risk_level = max(risk_level, text_risk, key=_RISK_RANK.__getitem__)
 
             if text_categories:
                 recommendations.append(f"文本包含{', '.join(text_categories)}类内容")
@@ -65,7 +80,7 @@ def combine_moderation_results(state: ContentModerationState) -> ContentModerati
 
         if not image_safe:
             overall_safe = False
-            risk_level = max(risk_level, image_risk, key=lambda x: ["low", "medium", "high"].index(x))
+            risk_level = max(risk_level, image_risk, key=_RISK_RANK.__getitem__)
 
             if image_categories:
                 recommendations.append(f"图片包含{', '.join(image_categories)}类内容")
@@ -83,7 +98,6 @@ def combine_moderation_results(state: ContentModerationState) -> ContentModerati
         recommendations.insert(0, "内容审核通过")
 
     return {
-        **state,
         "overall_safe": overall_safe,
         "risk_level": risk_level,
         "recommendations": recommendations,
@@ -100,20 +114,15 @@ def create_content_moderation_graph():
     graph.add_node("image_moderator", image_moderation_node)
     graph.add_node("result_combiner", combine_moderation_results)
 
-    # 设置入口和流程
-    graph.add_edge(START, "text_moderator")
-
-    # 条件边：如果有图片则进行图片审查
+    # 从入口并行分发到文本审查和图片审查（有图片时）
     graph.add_conditional_edges(
-        "text_moderator",
-        should_process_image,
-        {
-            True: "image_moderator",
-            False: "result_combiner"
-        }
-    ) 
+        START,
+        route_moderators,
+        ["text_moderator", "image_moderator"]
+    )
 
-    # 图片审查完后合并结果
+    # 各审查分支完成后合并结果
+    graph.add_edge("text_moderator", "result_combiner")
     graph.add_edge("image_moderator", "result_combiner")
     graph.add_edge("result_combiner", END)
 
@@ -155,17 +164,45 @@ def create_legacy_graph():
 
     return graph.compile()
 
-# 实例化graphs
-content_moderation_graph = create_content_moderation_graph()
-image_moderation_graph = create_image_moderation_graph()
-image_graph = create_image_processing_graph()
-legacy_graph = create_legacy_graph()
+GraphKind = Literal["content", "image_mod", "image_proc", "legacy"]
+
+_GRAPH_FACTORIES = {
+    "content": create_content_moderation_graph,
+    "image_mod": create_image_moderation_graph,
+    "image_proc": create_image_processing_graph,
+    "legacy": create_legacy_graph,
+}
 
-# 保持原有的graph变量用于向后兼容
-graph = legacy_graph
+@lru_cache(maxsize=None)
+def get_graph(kind: GraphKind):
+    """
+    获取编译好的graph，首次使用时才编译，之后复用同一实例
+
+    Args:
+        kind: graph类型（content/image_mod/image_proc/legacy）
+
+    Returns:
+        编译后的graph
+    """
+    return _GRAPH_FACTORIES[kind]()
+
+# 原有的模块级graph变量名（保持向后兼容），访问时按需编译
+_LEGACY_GRAPH_NAMES = {
+    "content_moderation_graph": "content",
+    "image_moderation_graph": "image_mod",
+    "image_graph": "image_proc",
+    "legacy_graph": "legacy",
+    "graph": "legacy",
+}
+
+def __getattr__(name: str):
+    kind = _LEGACY_GRAPH_NAMES.get(name)
+    if kind is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return get_graph(kind)
 
 # 便捷函数
-def process_image_moderation(image_base64: str) -> Dict[str, Any]:
+async def process_image_moderation(image_base64: str) -> Dict[str, Any]:
     """
     使用纯图片内容审查graph处理图片
 
@@ -196,7 +233,7 @@ def process_image_moderation(image_base64: str) -> Dict[str, Any]:
     }
 
     try:
-        result = image_moderation_graph.invoke(initial_state)
+        result = await get_graph("image_mod").ainvoke(initial_state)
 
         # 检查处理结果
         if result.get("error"):
@@ -224,7 +261,7 @@ def process_image_moderation(image_base64: str) -> Dict[str, Any]:
             "error": str(e)
         }
 
-def process_content_moderation(text_content: str = "", image_base64: str = "") -> Dict[str, Any]:
+async def process_content_moderation(text_content: str = "", image_base64: str = "") -> Dict[str, Any]:
     """
     使用综合内容审查graph处理文本和图片
 
@@ -256,7 +293,7 @@ def process_content_moderation(text_content: str = "", image_base64: str = "") -
     }
 
     try:
-        result = content_moderation_graph.invoke(initial_state)
+        result = await get_graph("content").ainvoke(initial_state)
 
         # 检查处理结果
         if result.get("error"):
@@ -285,12 +322,13 @@ def process_content_moderation(text_content: str = "", image_base64: str = "") -
             "error": str(e)
         }
 
-def process_image_with_graph(image_base64: str) -> Dict[str, Any]:
+async def process_image_with_graph(image_base64: str, image_hash: Optional[str] = None) -> Dict[str, Any]:
     """
     使用graph处理图片的便捷函数
 
     Args:
         image_base64: 图片的base64编码
+        image_hash: 图片原始字节的哈希值（可选），未提供时由节点解码计算
 
     Returns:
         处理结果
@@ -305,13 +343,14 @@ def process_image_with_graph(image_base64: str) -> Dict[str, Any]:
 
     initial_state = {
         "image_base64": image_base64,
+        "image_hash": image_hash,
         "messages": [],
         "result": None,
         "error": None
     }
 
     try:
-        result = image_graph.invoke(initial_state)
+        result = await get_graph("image_proc").ainvoke(initial_state)
 
         # 检查处理结果
         if result.get("error"):
@@ -1,8 +1,9 @@
+import time
 from datetime import datetime
 from enum import Enum
 from typing import Generic, TypeVar, Optional, Any, Dict
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
 
 # 定义泛型类型变量
 T = TypeVar('T')
@@ -37,7 +38,7 @@ class UnifiedResponse(BaseModel, Generic[T]):
     error_detail: Optional[Dict[str, Any]] = Field(default=None, description="详细错误信息")
 
     # 元数据字段
-    timestamp: datetime = Field(default_factory=datetime.now, description="响应时间戳")
+    timestamp: float = Field(default_factory=time.time, description="响应时间戳")
     request_id: Optional[str] = Field(default=None, description="请求ID")
     path: Optional[str] = Field(default=None, description="请求路径")
 
@@ -53,17 +54,26 @@ class UnifiedResponse(BaseModel, Generic[T]):
     total: Optional[int] = Field(default=None, description="总数")
     count: Optional[int] = Field(default=None, description="当前页数量")
 
+    @field_serializer("timestamp", when_used="json")
+    def serialize_timestamp(self, timestamp: float) -> str:
+        """输出JSON时才将时间戳格式化为ISO 8601字符串"""
+        return datetime.fromtimestamp(timestamp).isoformat()
+
 # 保持向后兼容的别名
 BaseResponse = UnifiedResponse
 
 class TaskResponse(BaseModel):
     """任务响应"""
+    model_config = ConfigDict(frozen=True)
+
     task_id: str = Field(description="任务ID")
     status: ProcessingStatus = Field(description="任务状态")
     message: str = Field(description="任务消息")
 
 class TaskResultResponse(BaseModel):
     """任务结果响应"""
+    model_config = ConfigDict(frozen=True)
+
     task_id: str = Field(description="任务ID")
     status: ProcessingStatus = Field(description="任务状态")
     message: str = Field(description="任务消息")
@@ -74,6 +84,8 @@ class TaskResultResponse(BaseModel):
 
 class ImageProcessingResult(BaseModel):
     """图片处理结果"""
+    model_config = ConfigDict(frozen=True)
+
     analysis_result: str = Field(description="AI分析结果")
     processing_time: Optional[float] = Field(default=None, description="处理时间（秒）")
     image_info: Optional[Dict[str, Any]] = Field(default=None, description="图片信息")
@@ -85,18 +97,24 @@ class AllTasksResponse(BaseModel):
 
 class HealthResponse(BaseModel):
     """健康检查响应"""
+    model_config = ConfigDict(frozen=True)
+
     status: str = Field(description="服务状态")
     version: str = Field(description="API版本")
     uptime: Optional[str] = Field(default=None, description="运行时间")
 
 class APIInfoResponse(BaseModel):
     """API信息响应"""
+    model_config = ConfigDict(frozen=True)
+
     message: str = Field(description="API描述")
     version: str = Field(description="API版本")
     endpoints: Dict[str, str] = Field(description="可用端点")
 
 class ErrorResponse(BaseModel):
     """错误响应"""
+    model_config = ConfigDict(frozen=True)
+
     detail: str = Field(description="错误详情")
     error_code: Optional[str] = Field(default=None, description="错误代码")
     path: Optional[str] = Field(default=None, description="请求路径")
@@ -119,24 +137,9 @@ def create_response(
     total: int = None,
     count: int = None
 ) -> UnifiedResponse:
-    """创建统一响应"""
-    return UnifiedResponse(
-        success=success,
-        message=message,
-        code=code,
-        data=data,
-        error=error,
-        error_code=error_code,
-        error_detail=error_detail,
-        request_id=request_id,
-        path=path,
-        task_id=task_id,
-        task_status=task_status,
-        processing_method=processing_method,
-        pagination=pagination,
-        total=total,
-        count=count
-    )
+    """创建统一响应，服务内部生成的数据可信，跳过校验且只设置非None字段"""
+    fields = {name: value for name, value in locals().items() if value is not None}
+    return UnifiedResponse.model_construct(**fields)
 
 # 预定义的成功响应
 def success_response(message: str = "操作成功", data: Any = None, **kwargs) -> UnifiedResponse:
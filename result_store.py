@@ -0,0 +1,58 @@
+from threading import Lock
+from typing import Any, Hashable, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+
+class ShardedResultStore:
+    """
+    分片的有界LRU结果存储
+
+    按key的哈希值将数据分散到多个分片，每个分片持有独立的锁和固定容量的LRU缓存，
+    总内存有上限，且读写只需锁住单个分片。
+    """
+
+    def __init__(self, capacity: int = 1024, shards: int = 16):
+        shard_capacity = max(1, capacity // shards)
+        self._shards = [(Lock(), LRUCache(maxsize=shard_capacity)) for _ in range(shards)]
+
+    def _shard(self, key: Hashable) -> Tuple[Lock, LRUCache]:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """写入结果，分片满时淘汰最久未使用的条目"""
+        lock, cache = self._shard(key)
+        with lock:
+            cache[key] = value
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[Any]:
+        """读取结果，不存在时返回default"""
+        lock, cache = self._shard(key)
+        with lock:
+            return cache.get(key, default)
+
+    def pop(self, key: Hashable, default: Any = None) -> Optional[Any]:
+        """删除并返回结果，不存在时返回default"""
+        lock, cache = self._shard(key)
+        with lock:
+            return cache.pop(key, default)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """逐个分片加锁获取所有结果的快照"""
+        snapshot = []
+        for lock, cache in self._shards:
+            with lock:
+                snapshot.extend(cache.items())
+        return snapshot
+
+    def __contains__(self, key: Hashable) -> bool:
+        lock, cache = self._shard(key)
+        with lock:
+            return key in cache
+
+    def __len__(self) -> int:
+        total = 0
+        for lock, cache in self._shards:
+            with lock:
+                total += len(cache)
+        return total
@@ -1,14 +1,45 @@
 """
 测试内容审查API
 """
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import MemoryHandler
+
+import orjson
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 BASE_URL = "http://localhost:8080"
 
+# 所有测试共享同一个会话，复用keep-alive连接
+SESSION = requests.Session()
+# 服务端偶发的5xx在已打开的连接上短暂退避后重试，重试用尽时返回最后一次响应
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=[502, 503, 504],
+    allowed_methods={"GET", "POST"},
+    raise_on_status=False
+)
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=RETRY))
+
+# 测试输出通过带缓冲的logger批量写出，完整JSON结果只在LOG=DEBUG时格式化
+log = logging.getLogger("moderation_tests")
+log.setLevel(os.getenv("LOG", "INFO"))
+_console_handler = logging.StreamHandler()
+_console_handler.setFormatter(logging.Formatter("%(message)s"))
+log.addHandler(MemoryHandler(capacity=64, target=_console_handler))
+
+def log_result(result) -> None:
+    """DEBUG级别下输出格式化的完整JSON结果"""
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("结果: %s", orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
+
 def test_text_moderation_api():
     """测试文本审查API"""
-    print("=== 测试文本审查API ===")
+    log.info("=== 测试文本审查API ===")
 
     test_cases = [
         {"text_content": "今天天气很好", "description": "正常文本"},
@@ -16,68 +47,73 @@ def test_text_moderation_api():
         {"text_content": "正常的商业交流", "description": "商务文本"}
     ]
 
-    for case in test_cases:
-        print(f"\n测试: {case['description']}")
-        print(f"文本: {case['text_content']}")
+    # 所有用例在线程池中并发请求，共享SESSION的连接池，按用例顺序输出结果
+    with ThreadPoolExecutor(max_workers=len(test_cases)) as executor:
+        futures = [
+            executor.submit(SESSION.post, f"{BASE_URL}/moderate-text", json=case)
+            for case in test_cases
+        ]
+
+    for case, future in zip(test_cases, futures):
+        log.info(f"\n测试: {case['description']}")
+        log.info(f"文本: {case['text_content']}")
 
         try:
-            response = requests.post(
-                f"{BASE_URL}/moderate-text",
-                json=case
-            )
+            response = future.result()
 
             if response.status_code == 200:
                 result = response.json()
-                print(f"✅ API调用成功")
-                print(f"结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
+                log.info("✅ API调用成功")
+                log_result(result)
             else:
-                print(f"❌ API调用失败: {response.status_code}")
-                print(f"错误: {response.text}")
+                log.error(f"❌ API调用失败: {response.status_code}")
+                log.info(f"错误: {response.text}")
 
-        except Exception as e:
-            print(f"❌ 请求异常: {e}")
+        except requests.RequestException as e:
+            log.error(f"❌ 请求异常: {e}")
 
-        print("-" * 60)
+        log.info("-" * 60)
 
 def test_health_check():
     """测试健康检查"""
-    print("\n=== 测试健康检查 ===")
+    log.info("\n=== 测试健康检查 ===")
 
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = SESSION.get(f"{BASE_URL}/health")
         if response.status_code == 200:
             result = response.json()
-            print("✅ 健康检查通过")
-            print(f"结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
+            log.info("✅ 健康检查通过")
+            log_result(result)
         else:
-            print(f"❌ 健康检查失败: {response.status_code}")
-    except Exception as e:
-        print(f"❌ 健康检查异常: {e}")
+            log.error(f"❌ 健康检查失败: {response.status_code}")
+    except requests.RequestException as e:
+        log.error(f"❌ 健康检查异常: {e}")
 
 def test_api_info():
     """测试API信息"""
-    print("\n=== 测试API信息 ===")
+    log.info("\n=== 测试API信息 ===")
 
     try:
-        response = requests.get(f"{BASE_URL}/")
+        response = SESSION.get(f"{BASE_URL}/")
         if response.status_code == 200:
             result = response.json()
-            print("✅ API信息获取成功")
-            print(f"结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
+            log.info("✅ API信息获取成功")
+            log_result(result)
         else:
-            print(f"❌ API信息获取失败: {response.status_code}")
-    except Exception as e:
-        print(f"❌ API信息获取异常: {e}")
+            log.error(f"❌ API信息获取失败: {response.status_code}")
+    except requests.RequestException as e:
+        log.error(f"❌ API信息获取异常: {e}")
 
 if __name__ == "__main__":
-    print("开始测试内容审查API...")
-    print("请确保API服务器已启动 (python app.py)")
-    print("=" * 60)
+    log.info("开始测试内容审查API...")
+    log.info("请确保API服务器已启动 (python app.py)")
+    log.info("=" * 60)
 
-    # 运行测试
-    test_api_info()
-    test_health_check()
-    test_text_moderation_api()
+    # 运行测试，结束后关闭会话
+    with SESSION:
+        test_api_info()
+        test_health_check()
+        test_text_moderation_api()
 
-    print("\n测试完成!")
-    print("如需测试图片上传功能，请使用 http://localhost:8080/docs 中的交互式文档")
\ No newline at end of file
+    log.info("\n测试完成!")
+    log.info("如需测试图片上传功能，请使用 http://localhost:8080/docs 中的交互式文档")
\ No newline at end of file
@@ -1,9 +1,17 @@
 """
 测试综合内容审查功能
 """
+import asyncio
 import base64
+from functools import lru_cache
 from main import process_content_moderation
 from llm_node import load_image_as_base64
+from text_moderation_node import _is_fast_path, moderate_text_with_keywords
+
+@lru_cache(maxsize=1)
+def load_test_image_base64() -> str:
+    """加载测试图片并编码，只在首次调用时读取文件，所有用例复用同一份base64"""
+    return load_image_as_base64("./images/image1.jpg")
 
 def test_text_only_moderation():
     """测试纯文本审查"""
@@ -20,7 +28,7 @@ def test_text_only_moderation():
     for text, description in test_cases:
         print(f"\n测试内容: {description}")
         print(f"文本: {text}")
-        result = process_content_moderation(text_content=text)
+        result = asyncio.run(process_content_moderation(text_content=text))
         print(f"审查结果: {result}")
         print("-" * 50)
 
@@ -30,8 +38,8 @@ def test_image_only_moderation():
 
     try:
         # 加载测试图片
-        image_base64 = load_image_as_base64("./images/image1.jpg")
-        result = process_content_moderation(image_base64=image_base64)
+        image_base64 = load_test_image_base64()
+        result = asyncio.run(process_content_moderation(image_base64=image_base64))
         print(f"图片审查结果: {result}")
     except Exception as e:
         print(f"图片审查失败: {e}")
@@ -48,12 +56,12 @@ def test_combined_moderation():
     ]
 
     try:
-        image_base64 = load_image_as_base64("./images/image1.jpg")
+        image_base64 = load_test_image_base64()
 
         for text, description in test_cases:
             print(f"\n测试内容: {description}")
             print(f"文本: {text}")
-            result = process_content_moderation(text_content=text, image_base64=image_base64)
+            result = asyncio.run(process_content_moderation(text_content=text, image_base64=image_base64))
             print(f"综合审查结果: {result}")
             print("-" * 50)
 
@@ -66,20 +74,35 @@ def test_edge_cases():
 
     # 空内容
     print("测试空内容:")
-    result = process_content_moderation()
+    result = asyncio.run(process_content_moderation())
     print(f"结果: {result}")
 
     # 只有空格的文本
     print("\n测试只有空格的文本:")
-    result = process_content_moderation(text_content="   ")
+    result = asyncio.run(process_content_moderation(text_content="   "))
     print(f"结果: {result}")
 
     # 很长的文本
     print("\n测试长文本:")
     long_text = "正常内容 " * 100
-    result = process_content_moderation(text_content=long_text)
+    result = asyncio.run(process_content_moderation(text_content=long_text))
     print(f"结果: {result.get('success', False)}, 风险级别: {result.get('data', {}).get('risk_level', 'unknown')}")
 
+def test_short_text_fast_path():
+    """测试短文本快速通道：只有ASCII标点可以跳过LLM，含文字或emoji的短文本必须交给LLM"""
+    print("\n=== 测试短文本快速通道 ===")
+
+    test_cases = [
+        ("我要炸学校", False),
+        ("🔫", False),
+        ("?!", True)
+    ]
+
+    for text, expected in test_cases:
+        fast_path = _is_fast_path(text, moderate_text_with_keywords(text))
+        print(f"文本: {text} 跳过LLM: {fast_path}")
+        assert fast_path == expected, f"{text!r} 的快速通道判定应为 {expected}"
+
 if __name__ == "__main__":
     print("开始测试综合内容审查功能...")
 
@@ -88,5 +111,6 @@ if __name__ == "__main__":
     test_image_only_moderation()
     test_combined_moderation()
     test_edge_cases()
+    test_short_text_fast_path()
 
     print("\n测试完成!")
\ No newline at end of file
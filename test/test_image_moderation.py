@@ -1,20 +1,27 @@
 """
 测试图片内容审查功能
 """
+import asyncio
 import base64
+from functools import lru_cache
 from main import process_image_moderation, process_content_moderation
 from llm_node import load_image_as_base64
 
+@lru_cache(maxsize=1)
+def load_test_image_base64() -> str:
+    """加载测试图片并编码，只在首次调用时读取文件，所有用例复用同一份base64"""
+    return load_image_as_base64("../images/image1.jpg")
+
 def test_image_only_moderation():
     """测试纯图片内容审查"""
     print("=== 测试纯图片内容审查 ===")
 
     try:
         # 加载测试图片
-        image_base64 = load_image_as_base64("../images/image1.jpg")
+        image_base64 = load_test_image_base64()
         print("正在审查图片内容...")
 
-        result = process_image_moderation(image_base64)
+        result = asyncio.run(process_image_moderation(image_base64))
 
         print(f"[OK] 图片审查成功")
         print(f"整体安全: {result['data']['overall_safe']}")
@@ -49,16 +56,16 @@ def test_combined_moderation():
     ]
 
     try:
-        image_base64 = load_image_as_base64("../images/image1.jpg")
+        image_base64 = load_test_image_base64()
 
         for text, description in test_cases:
             print(f"\n测试场景: {description}")
             print(f"文本: {text}")
 
-            result = process_content_moderation(
+            result = asyncio.run(process_content_moderation(
                 text_content=text,
                 image_base64=image_base64
-            )
+            ))
 
             if result["success"]:
                 data = result["data"]
@@ -90,12 +97,12 @@ def test_edge_cases():
 
     # 测试空图片
     print("测试空图片base64:")
-    result = process_image_moderation("")
+    result = asyncio.run(process_image_moderation(""))
     print(f"结果: {result.get('success', False)}, 错误: {result.get('error', 'N/A')}")
 
     # 测试无效base64
     print("\n测试无效base64:")
-    result = process_image_moderation("invalid_base64_string")
+    result = asyncio.run(process_image_moderation("invalid_base64_string"))
     print(f"结果: {result.get('success', False)}, 错误: {result.get('error', 'N/A')}")
 
 def test_comparison_with_original():
@@ -103,17 +110,17 @@ def test_comparison_with_original():
     print("\n=== 功能对比测试 ===")
 
     try:
-        image_base64 = load_image_as_base64("../images/image1.jpg")
+        image_base64 = load_test_image_base64()
 
         print("1. 原有图片分析功能:")
         from main import process_image_with_graph
-        original_result = process_image_with_graph(image_base64)
+        original_result = asyncio.run(process_image_with_graph(image_base64))
         print(f"   成功: {original_result.get('success')}")
         if original_result.get('success'):
             print(f"   数据长度: {len(str(original_result.get('data', '')))}")
 
         print("\n2. 新的图片审查功能:")
-        moderation_result = process_image_moderation(image_base64)
+        moderation_result = asyncio.run(process_image_moderation(image_base64))
         print(f"   成功: {moderation_result.get('success')}")
         if moderation_result.get('success'):
             data = moderation_result.get('data', {})
@@ -121,10 +128,10 @@ def test_comparison_with_original():
             print(f"   风险级别: {data.get('risk_level')}")
 
         print("\n3. 综合审查功能:")
-        combined_result = process_content_moderation(
+        combined_result = asyncio.run(process_content_moderation(
             text_content="请分析这张图片",
             image_base64=image_base64
-        )
+        ))
         print(f"   成功: {combined_result.get('success')}")
         if combined_result.get('success'):
             data = combined_result.get('data', {})
@@ -1,16 +1,46 @@
 """
 测试所有内容审查API端点
 """
+import asyncio
+import io
 import requests
 import json
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 BASE_URL = "http://localhost:8080"
 
+# 所有测试共享同一个会话，复用keep-alive连接
+SESSION = requests.Session()
+# 服务端偶发的5xx在已打开的连接上短暂退避后重试，重试用尽时返回最后一次响应
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=[502, 503, 504],
+    allowed_methods={"GET", "POST"},
+    raise_on_status=False
+)
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=RETRY))
+
+
+# 测试图片只读取一次，所有上传用例复用同一份字节
+try:
+    with open("../images/image1.jpg", "rb") as f:
+        IMG_BYTES = f.read()
+except FileNotFoundError:
+    IMG_BYTES = None
+
+
+def async_client() -> httpx.AsyncClient:
+    """并发测试使用的异步客户端，LLM接口耗时较长，不设置超时"""
+    return httpx.AsyncClient(base_url=BASE_URL, timeout=None, limits=httpx.Limits(max_connections=16))
+
 def test_api_info():
     """测试API信息"""
     print("=== 测试API信息 ===")
     try:
-        response = requests.get(f"{BASE_URL}/")
+        response = SESSION.get(f"{BASE_URL}/")
         if response.status_code == 200:
             result = response.json()
             print("[OK] API信息获取成功")
@@ -19,55 +49,58 @@ def test_api_info():
                 print(f"  {name}: {endpoint}")
         else:
             print(f"[ERROR] API信息获取失败: {response.status_code}")
-    except Exception as e:
+    except requests.RequestException as e:
         print(f"[ERROR] API信息获取异常: {e}")
 
 def test_health_check():
     """测试健康检查"""
     print("\n=== 测试健康检查 ===")
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = SESSION.get(f"{BASE_URL}/health")
         if response.status_code == 200:
             result = response.json()
             print("[OK] 健康检查通过")
             print(f"  状态: {result.get('data', {}).get('status')}")
         else:
             print(f"[ERROR] 健康检查失败: {response.status_code}")
-    except Exception as e:
+    except requests.RequestException as e:
         print(f"[ERROR] 健康检查异常: {e}")
 
 def test_text_moderation_api():
-    """测试文本审查API"""
+    """测试文本审查API，所有用例并发请求"""
     print("\n=== 测试文本审查API ===")
+    asyncio.run(_run_text_cases())
+
+async def _run_text_cases():
+    """并发发送文本审查用例并按用例顺序输出结果"""
 
     test_cases = [
         {"text_content": "今天天气很好", "description": "正常文本"},
         {"text_content": "这是一段包含暴力和血腥的内容", "description": "敏感文本"}
     ]
 
-    for case in test_cases:
+    async with async_client() as client:
+        responses = await asyncio.gather(
+            *(client.post("/moderate-text", json=case) for case in test_cases),
+            return_exceptions=True
+        )
+
+    for case, response in zip(test_cases, responses):
         print(f"\n测试: {case['description']}")
         print(f"文本: {case['text_content']}")
 
-        try:
-            response = requests.post(
-                f"{BASE_URL}/moderate-text",
-                json=case
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                print("[OK] 文本审查API调用成功")
-                data = result.get('data', {})
-                print(f"  整体安全: {data.get('overall_safe')}")
-                print(f"  风险级别: {data.get('risk_level')}")
-                print(f"  建议: {data.get('recommendations', [])[:2]}")
-            else:
-                print(f"[ERROR] 文本审查API调用失败: {response.status_code}")
-                print(f"  错误: {response.text}")
-
-        except Exception as e:
-            print(f"[ERROR] 文本审查请求异常: {e}")
+        if isinstance(response, Exception):
+            print(f"[ERROR] 文本审查请求异常: {response}")
+        elif response.status_code == 200:
+            result = response.json()
+            print("[OK] 文本审查API调用成功")
+            data = result.get('data', {})
+            print(f"  整体安全: {data.get('overall_safe')}")
+            print(f"  风险级别: {data.get('risk_level')}")
+            print(f"  建议: {data.get('recommendations', [])[:2]}")
+        else:
+            print(f"[ERROR] 文本审查API调用失败: {response.status_code}")
+            print(f"  错误: {response.text}")
 
         print("-" * 50)
 
@@ -75,99 +108,102 @@ def test_image_moderation_api():
     """测试图片审查API"""
     print("\n=== 测试图片审查API ===")
 
-    try:
-        # 使用测试图片
-        with open("../images/image1.jpg", "rb") as f:
-            files = {"file": ("test.jpg", f, "image/jpeg")}
-            response = requests.post(f"{BASE_URL}/moderate-image", files=files)
-
-            if response.status_code == 200:
-                result = response.json()
-                print("[OK] 图片审查API调用成功")
-                data = result.get('data', {})
-                print(f"  整体安全: {data.get('overall_safe')}")
-                print(f"  风险级别: {data.get('risk_level')}")
-                print(f"  建议: {data.get('recommendations', [])[:2]}")
-
-                if data.get('image_moderation'):
-                    img_mod = data['image_moderation']
-                    print(f"  图片审查置信度: {img_mod.get('confidence', 0)}")
-                    print(f"  描述: {img_mod.get('description', 'N/A')[:50]}...")
-            else:
-                print(f"[ERROR] 图片审查API调用失败: {response.status_code}")
-                print(f"  错误: {response.text}")
-
-    except FileNotFoundError:
+    if IMG_BYTES is None:
         print("[SKIP] 测试图片不存在，跳过图片审查测试")
-    except Exception as e:
-        print(f"[ERROR] 图片审查请求异常: {e}")
-
-def test_content_moderation_api():
-    """测试综合内容审查API"""
-    print("\n=== 测试综合内容审查API ===")
+        return
 
-    # 测试1: 仅文本
-    print("\n测试1: 仅文本内容")
     try:
-        data = {"text_content": "请描述这张美丽的风景照片"}
-        response = requests.post(
-            f"{BASE_URL}/moderate-content",
-            data=data
-        )
+        # 使用测试图片
+        files = {"file": ("test.jpg", io.BytesIO(IMG_BYTES), "image/jpeg")}
+        response = SESSION.post(f"{BASE_URL}/moderate-image", files=files)
 
         if response.status_code == 200:
             result = response.json()
-            print("[OK] 综合审查(仅文本)成功")
+            print("[OK] 图片审查API调用成功")
             data = result.get('data', {})
             print(f"  整体安全: {data.get('overall_safe')}")
-            print(f"  包含文本审查: {'text_moderation' in data}")
-            print(f"  包含图片审查: {'image_moderation' in data}")
+            print(f"  风险级别: {data.get('risk_level')}")
+            print(f"  建议: {data.get('recommendations', [])[:2]}")
+
+            if data.get('image_moderation'):
+                img_mod = data['image_moderation']
+                print(f"  图片审查置信度: {img_mod.get('confidence', 0)}")
+                print(f"  描述: {img_mod.get('description', 'N/A')[:50]}...")
         else:
-            print(f"[ERROR] 综合审查(仅文本)失败: {response.status_code}")
-    except Exception as e:
-        print(f"[ERROR] 综合审查(仅文本)异常: {e}")
+            print(f"[ERROR] 图片审查API调用失败: {response.status_code}")
+            print(f"  错误: {response.text}")
+
+    except requests.RequestException as e:
+        print(f"[ERROR] 图片审查请求异常: {e}")
+
+def test_content_moderation_api():
+    """测试综合内容审查API，仅文本和文本+图片两个用例并发请求"""
+    print("\n=== 测试综合内容审查API ===")
+    asyncio.run(_run_content_cases())
+
+async def _run_content_cases():
+    """并发发送综合审查用例并依次输出结果"""
+
+    async with async_client() as client:
+        requests_to_send = [
+            client.post("/moderate-content", data={"text_content": "请描述这张美丽的风景照片"})
+        ]
+        if IMG_BYTES is not None:
+            requests_to_send.append(client.post(
+                "/moderate-content",
+                files={"file": ("test.jpg", IMG_BYTES, "image/jpeg")},
+                data={"text_content": "请分析这张图片"}
+            ))
+        text_response, *image_responses = await asyncio.gather(*requests_to_send, return_exceptions=True)
+
+    # 测试1: 仅文本
+    print("\n测试1: 仅文本内容")
+    if isinstance(text_response, Exception):
+        print(f"[ERROR] 综合审查(仅文本)异常: {text_response}")
+    elif text_response.status_code == 200:
+        result = text_response.json()
+        print("[OK] 综合审查(仅文本)成功")
+        data = result.get('data', {})
+        print(f"  整体安全: {data.get('overall_safe')}")
+        print(f"  包含文本审查: {'text_moderation' in data}")
+        print(f"  包含图片审查: {'image_moderation' in data}")
+    else:
+        print(f"[ERROR] 综合审查(仅文本)失败: {text_response.status_code}")
 
     # 测试2: 文本+图片
     print("\n测试2: 文本+图片内容")
-    try:
-        with open("../images/image1.jpg", "rb") as f:
-            files = {"file": ("test.jpg", f, "image/jpeg")}
-            data = {"text_content": "请分析这张图片"}
-            response = requests.post(
-                f"{BASE_URL}/moderate-content",
-                files=files,
-                data=data
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                print("[OK] 综合审查(文本+图片)成功")
-                data = result.get('data', {})
-                print(f"  整体安全: {data.get('overall_safe')}")
-                print(f"  风险级别: {data.get('risk_level')}")
-                print(f"  包含文本审查: {'text_moderation' in data}")
-                print(f"  包含图片审查: {'image_moderation' in data}")
-                print(f"  建议: {data.get('recommendations', [])[:3]}")
-            else:
-                print(f"[ERROR] 综合审查(文本+图片)失败: {response.status_code}")
-                print(f"  错误: {response.text}")
-
-    except FileNotFoundError:
+    if not image_responses:
         print("[SKIP] 测试图片不存在，跳过综合审查图片测试")
-    except Exception as e:
-        print(f"[ERROR] 综合审查(文本+图片)异常: {e}")
+        return
+
+    response = image_responses[0]
+    if isinstance(response, Exception):
+        print(f"[ERROR] 综合审查(文本+图片)异常: {response}")
+    elif response.status_code == 200:
+        result = response.json()
+        print("[OK] 综合审查(文本+图片)成功")
+        data = result.get('data', {})
+        print(f"  整体安全: {data.get('overall_safe')}")
+        print(f"  风险级别: {data.get('risk_level')}")
+        print(f"  包含文本审查: {'text_moderation' in data}")
+        print(f"  包含图片审查: {'image_moderation' in data}")
+        print(f"  建议: {data.get('recommendations', [])[:3]}")
+    else:
+        print(f"[ERROR] 综合审查(文本+图片)失败: {response.status_code}")
+        print(f"  错误: {response.text}")
 
 if __name__ == "__main__":
     print("开始测试内容审查API端点...")
     print("请确保API服务器已启动 (python app.py)")
     print("=" * 60)
 
-    # 运行所有测试
-    test_api_info()
-    test_health_check()
-    test_text_moderation_api()
-    test_image_moderation_api()
-    test_content_moderation_api()
+    # 运行所有测试，结束后关闭会话
+    with SESSION:
+        test_api_info()
+        test_health_check()
+        test_text_moderation_api()
+        test_image_moderation_api()
+        test_content_moderation_api()
 
     print("\n" + "=" * 60)
     print("API测试完成!")
@@ -1,10 +1,22 @@
-import os
-from typing import Dict, Any, List
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+import ahocorasick
+import orjson
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from llm_client import get_chat_llm
 import re
+import string
+from threading import Lock
+from cachetools import LRUCache
 
+# 以去除首尾空白后的文本为key缓存LLM的原始回复，解析在缓存之外进行，
+# 请求或解析失败的回复不写入缓存。审查节点在线程池中执行，读写需要加锁
+_RESPONSE_CACHE = LRUCache(maxsize=4096)
+_RESPONSE_CACHE_LOCK = Lock()
 
+
+@lru_cache(maxsize=1)
 def load_moderation_keywords():
     """
     加载敏感词列表
@@ -22,26 +34,69 @@ def load_moderation_keywords():
     return moderation_keywords
 
 
-def moderate_text_with_llm(text: str) -> Dict[str, Any]:
+# 各类别中含义明确、命中即可判定的关键词，命中时关键词检测结果具有较高置信度
+DEFINITE_KEYWORDS = {
+    "violence": {"暴力", "血腥"},
+    "adult": {"色情", "色情内容", "露骨"},
+    "illegal": {"毒品", "赌博", "诈骗", "走私"},
+    "hate": {"歧视", "仇恨", "辱骂"},
+}
+_DEFINITE_KEYWORD_SET = frozenset(
+    keyword.lower() for keywords in DEFINITE_KEYWORDS.values() for keyword in keywords
+)
+
+# 短文本阈值，未命中任何关键词且只含ASCII标点和空白的短文本可直接判定为安全
+_SHORT_TEXT_LENGTH = 8
+_PUNCTUATION_CHARS = frozenset(string.punctuation + string.whitespace)
+
+
+def _is_fast_path(text_content: str, pre_result: Dict[str, Any]) -> bool:
     """
-    使用LLM进行文本内容审查
+    判断关键词检测结果是否足以直接判定，无需再请求LLM
+
+    命中明确关键词且风险高，或未命中任何关键词、只含ASCII标点和空白的短文本；
+    含文字或emoji等符号的短文本即使未命中关键词也可能违规（如"我要炸学校"、"🔫"），仍交给LLM审查
 
     Args:
-        text: 待审查的文本
+        text_content: 待审查的文本
+        pre_result: moderate_text_with_keywords的检测结果
 
     Returns:
-        审查结果字典
+        是否直接返回关键词检测结果
     """
-    load_dotenv()
-
-    chatLLM = ChatOpenAI(
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        base_url=os.getenv("DASHSCOPE_API_URL"),
-        model="qwen-plus",  # 可以使用通文本模型如 qwen-plus
-        temperature=0.1  # 降低温度以获得更一致的判断
+    if pre_result["confidence"] < 0.9:
+        return False
+    if pre_result["risk_level"] == "high":
+        return True
+    return (
+        not pre_result["categories"]
+        and len(text_content) < _SHORT_TEXT_LENGTH
+        and text_content.isascii()
+        and all(ch in _PUNCTUATION_CHARS for ch in text_content)
     )
 
-    system_prompt = """你是一个专业的文本内容审核员。请审核用户输入的文本内容是否包含不当信息。
+def _build_keyword_automaton() -> ahocorasick.Automaton:
+    """将所有关键词（小写）编译为Aho-Corasick自动机，值为(类别, 关键词)"""
+    automaton = ahocorasick.Automaton()
+    for category, keywords in load_moderation_keywords().items():
+        for keyword in keywords:
+            automaton.add_word(keyword.lower(), (category, keyword.lower()))
+    automaton.make_automaton()
+    return automaton
+
+
+# 一次线性扫描即可找出文本中所有（包括相互重叠的）关键词
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+# 关键词都不区分大小写（如中文）时，文本无需转换为小写即可直接扫描，省去一次完整复制
+_KEYWORDS_CASELESS = all(
+    keyword.lower() == keyword.upper()
+    for keywords in load_moderation_keywords().values()
+    for keyword in keywords
+)
+
+
+_SYSTEM_PROMPT = """你是一个专业的文本内容审核员。请审核用户输入的文本内容是否包含不当信息。
 
 审核标准包括但不限于：
 1. 暴力、血腥内容
@@ -66,28 +121,78 @@ def moderate_text_with_llm(text: str) -> Dict[str, Any]:
   "confidence": 0.95
 }"""
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"请审核以下文本内容：\n\n{text}"}
-    ]
+
+# 文本审查提示模板只构建一次；系统提示中的JSON示例含有花括号，以消息对象传入避免被当作模板变量
+_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=_SYSTEM_PROMPT),
+    ("user", "请审核以下文本内容：\n\n{text}")
+])
+
+
+def _build_messages(text: str) -> List[BaseMessage]:
+    """构建文本审查的消息列表"""
+    return _PROMPT.format_messages(text=text)
+
+
+# markdown代码块中的JSON对象，非贪婪匹配到紧跟代码块结束标记的"}"，兼容嵌套对象
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+# 没有代码块时匹配第一个"{"到最后一个"}"之间的内容，兼容前后附加的说明文字
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _parse_llm_json(content: str) -> Dict[str, Any]:
+    """
+    解析LLM回复中的JSON审查结果
+
+    Args:
+        content: LLM回复内容，可能包含markdown格式的JSON
+
+    Returns:
+        审查结果字典
+    """
+    # 优先取代码块中的JSON，说明文字中的"{"不会干扰匹配
+    match = _FENCE_RE.search(content)
+    if match:
+        return orjson.loads(match.group(1))
+    match = _JSON_RE.search(content)
+    # 没有找到JSON对象时尝试直接解析
+    return orjson.loads(match.group(0) if match else content)
+
+
+def _get_cached_response(text: str) -> Optional[str]:
+    """获取文本对应的已缓存LLM回复"""
+    with _RESPONSE_CACHE_LOCK:
+        return _RESPONSE_CACHE.get(text.strip())
+
+
+def _cache_response(text: str, content: str) -> None:
+    """缓存解析成功的LLM回复"""
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[text.strip()] = content
+
+
+def moderate_text_with_llm(text: str) -> Dict[str, Any]:
+    """
+    使用LLM进行文本内容审查
+
+    Args:
+        text: 待审查的文本
+
+    Returns:
+        审查结果字典
+    """
+    cached_content = _get_cached_response(text)
+    if cached_content is not None:
+        return _parse_llm_json(cached_content)
+
+    chatLLM = get_chat_llm("qwen-plus", temperature=0.1)
 
     try:
-        response = chatLLM.invoke(messages)
+        response = chatLLM.invoke(_build_messages(text))
         # 解析LLM的回复
-        content = response.content
-
-        # 尝试提取JSON内容
-        import json
-        # 如果回复包含markdown格式的JSON，提取JSON部分
-        if "```json" in content:
-            json_start = content.find("```json") + 7
-            json_end = content.find("```", json_start)
-            json_content = content[json_start:json_end].strip()
-            result = json.loads(json_content)
-        else:
-            # 尝试直接解析
-            result = json.loads(content)
-
+        result = _parse_llm_json(response.content)
+        _cache_response(text, response.content)
         return result
     except Exception as e:
         # 如果LLM解析失败，返回到关键词检测
@@ -105,27 +210,25 @@ def moderate_text_with_keywords(text: str) -> Dict[str, Any]:
     Returns:
         审查结果字典
     """
-    moderation_keywords = load_moderation_keywords()
-    text_lower = text.lower()
-
-    detected_categories = []
+    # 命中的类别去重（按首次出现排序的有序集合），风险级别按不同类别的数量判断
+    detected_categories: Dict[str, None] = {}
     detected_keywords = []
 
-    for category, keywords in moderation_keywords.items():
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                detected_categories.append(category)
-                detected_keywords.append(keyword)
+    # 自动机单次扫描找出所有命中的关键词，按首次出现去重
+    haystack = text if _KEYWORDS_CASELESS else text.lower()
+    for category, keyword in dict.fromkeys(value for _, value in _KEYWORD_AUTOMATON.iter(haystack)):
+        detected_categories[category] = None
+        detected_keywords.append(keyword)
 
-    is_safe = len(detected_categories) == 0
+    is_safe = not detected_keywords
     risk_level = "low" if is_safe else ("high" if len(detected_categories) >= 3 else "medium")
 
     return {
         "is_safe": is_safe,
         "risk_level": risk_level,
-        "categories": detected_categories,
-        "reasons": [f"检测到敏感词: {', '.join(detected_keywords)}"] if detected_keywords else [],
-        "confidence": 0.8 if detected_keywords else 1.0,
+        "categories": list(detected_categories),
+        "reasons": [] if is_safe else [f"检测到敏感词: {', '.join(detected_keywords)}"],
+        "confidence": (0.95 if _DEFINITE_KEYWORD_SET.intersection(detected_keywords) else 0.8) if detected_keywords else 1.0,
         "detected_keywords": detected_keywords
     }
 
@@ -156,8 +259,17 @@ def text_moderation_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "error": None
         }
 
+    # 关键词检测足以判定时直接返回，不再请求LLM
+    pre_result = moderate_text_with_keywords(text_content)
+    if _is_fast_path(text_content, pre_result):
+        pre_result["method"] = "fast_path"
+        return {
+            "text_moderation_result": pre_result,
+            "error": None
+        }
+
     try:
-        # 优先使用LLM进行审查
+        # 其余情况使用LLM进行审查
         result = moderate_text_with_llm(text_content)
         result["method"] = "llm_analysis"
 
@@ -182,6 +294,11 @@ def text_moderation_node(state: Dict[str, Any]) -> Dict[str, Any]:
             }
 
 
+# 风险级别与整数等级的对应关系，批量汇总时比较整数而不是字符串
+_RISK_RANK = {"low": 0, "medium": 1, "high": 2}
+_RISK_NAMES = ["low", "medium", "high"]
+
+
 def moderate_multiple_texts(texts: List[str]) -> Dict[str, Any]:
     """
     批量审查多个文本
@@ -192,27 +309,50 @@ def moderate_multiple_texts(texts: List[str]) -> Dict[str, Any]:
     Returns:
         批量审查结果
     """
+    # 命中缓存的文本直接解析，其余非空文本通过batch并发请求LLM，失败的请求单独回退到关键词检测
+    llm_results = {}
+    uncached_texts = []
+    for text in dict.fromkeys(text for text in texts if text):
+        cached_content = _get_cached_response(text)
+        if cached_content is not None:
+            llm_results[text] = _parse_llm_json(cached_content)
+        else:
+            uncached_texts.append(text)
+
+    responses = get_chat_llm("qwen-plus", temperature=0.1).batch(
+        [_build_messages(text) for text in uncached_texts],
+        config={"max_concurrency": 8},
+        return_exceptions=True
+    ) if uncached_texts else []
+    for text, response in zip(uncached_texts, responses):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            llm_results[text] = _parse_llm_json(response.content)
+            _cache_response(text, response.content)
+        except Exception as e:
+            print(f"LLM文本解析失败: {e}")
+            llm_results[text] = moderate_text_with_keywords(text)
+
     results = []
     overall_safe = True
-    highest_risk = "low"
+    top_rank = 0
 
     for text in texts:
-        result = moderate_text_with_llm(text) if text else {"is_safe": True, "risk_level": "low"}
+        result = llm_results[text] if text else {"is_safe": True, "risk_level": "low"}
         results.append(result)
 
         if not result.get("is_safe", True):
             overall_safe = False
 
-        # 更新最高风险级别
-        risk = result.get("risk_level", "low")
-        if risk == "high":
-            highest_risk = "high"
-        elif risk == "medium" and highest_risk == "low":
-            highest_risk = "medium"
+        # 按整数等级取最高风险级别，未知等级按low处理
+        rank = _RISK_RANK.get(result.get("risk_level", "low"), 0)
+        if rank > top_rank:
+            top_rank = rank
 
     return {
         "overall_safe": overall_safe,
-        "highest_risk_level": highest_risk,
+        "highest_risk_level": _RISK_NAMES[top_rank],
         "individual_results": results,
         "total_texts": len(texts)
     }